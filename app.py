@@ -69,14 +69,17 @@ if not os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON"):
 # ─────────────────────────────────────────────────────────────
 # Helper: extract request_token from URL or token
 # ─────────────────────────────────────────────────────────────
+_REQUEST_TOKEN_RE = re.compile(r"request_token=([A-Za-z0-9]+)")
+_BARE_TOKEN_RE = re.compile(r"[A-Za-z0-9]{6,}")
+
 def extract_request_token(text: str) -> str:
     if not text:
         return ""
     t = text.strip()
-    m = re.search(r"request_token=([A-Za-z0-9]+)", t)
+    m = _REQUEST_TOKEN_RE.search(t)
     if m:
         return m.group(1)
-    if re.fullmatch(r"[A-Za-z0-9]{6,}", t):
+    if _BARE_TOKEN_RE.fullmatch(t):
         return t
     return ""
 
@@ -100,6 +103,13 @@ st.sidebar.header("🔐 Zerodha Session")
 def load_zerodha_creds_cached():
     return load_credentials_from_gsheet()
 
+@st.cache_data(ttl=300, show_spinner=False)
+def fetch_profile_cached(api_key: str, access_token: str) -> dict:
+    # Token check via kite.profile(), at most once per 5 min per token (failures aren't cached)
+    k = KiteConnect(api_key=api_key)
+    k.set_access_token(access_token)
+    return k.profile()
+
 def kite_login_flow(api_key: str, api_secret: str) -> str:
     if not api_key or not api_secret:
         st.sidebar.error("ZerodhaTokenStore missing API key/secret (A1/B1).")
@@ -162,7 +172,7 @@ try:
 
     kite = KiteConnect(api_key=api_key)
     kite.set_access_token(access_token)
-    profile = kite.profile()
+    profile = fetch_profile_cached(api_key, access_token)
     st.sidebar.success(f"✅ Logged in: {profile.get('user_name','?')} ({profile.get('user_id','?')})")
 
 except Exception as e:
@@ -217,10 +227,18 @@ except Exception as e:
 
 df.columns = [str(c).strip() for c in df.columns]
 
+def _to_numeric_if_clean(s: pd.Series) -> pd.Series:
+    # Same result as to_numeric(errors="ignore") without its raise/catch per column:
+    # keep the original unless every non-blank value parses ("" becomes NaN, as there)
+    if pd.api.types.is_numeric_dtype(s):
+        return s
+    num = pd.to_numeric(s, errors="coerce")
+    return num if num.notna().sum() == (s.notna() & s.ne("")).sum() else s
+
 for c in df.columns:
     if c in ("Symbol", "Trend Direction", "Regime", "SignalReason", "DataQuality"):
         continue
-    df[c] = pd.to_numeric(df[c], errors="ignore")
+    df[c] = _to_numeric_if_clean(df[c])
 
 # Freshness (defensive)
 if "AsOf" in df.columns:
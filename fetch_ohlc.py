@@ -1,6 +1,9 @@
+import os
+import logging
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from typing import Optional
 import pytz
 from functools import lru_cache
 
@@ -8,25 +11,41 @@ from kiteconnect import KiteConnect
 
 # We reuse your sheet-based creds loader so we don't touch st.secrets here.
 from utils.token_utils import load_credentials_from_gsheet
+from utils.instrument_cache import get_instrument_map
+from utils.rate_limit import HIST_LIMITER
+from utils.token_store import KITE_POOL
 
 IST = pytz.timezone("Asia/Kolkata")
 
+logger = logging.getLogger(__name__)
+
+# Local candle cache (one parquet file per symbol + interval)
+OHLC_CACHE_DIR = os.getenv("OHLC_CACHE_DIR", ".cache/ohlc")
+# DataFrame.attrs key (kept in the parquet file) holding the IST day of the last full fetch
+_FULL_FETCH_DAY = "full_fetch_day"
+
+# Candle length per Kite interval (minutes); used to overlap incremental fetches
+_INTERVAL_MINUTES = {
+    "minute": 1,
+    "3minute": 3,
+    "5minute": 5,
+    "10minute": 10,
+    "15minute": 15,
+    "30minute": 30,
+    "60minute": 60,
+    "day": 24 * 60,
+}
+
 # -------------------------------
 # Kite helpers
 # -------------------------------
 @lru_cache(maxsize=1)
 def _kite() -> KiteConnect:
     api_key, api_secret, access_token = load_credentials_from_gsheet()
-    kite = KiteConnect(api_key=api_key)
+    kite = KiteConnect(api_key=api_key, pool=KITE_POOL)
     kite.set_access_token(access_token)
     return kite
 
-@lru_cache(maxsize=1)
-def _nse_instruments_df() -> pd.DataFrame:
-    k = _kite()
-    inst = k.instruments(exchange="NSE")
-    return pd.DataFrame(inst)
-
 @lru_cache(maxsize=512)
 def _instrument_token_for_symbol(symbol: str) -> int:
     """
@@ -34,30 +53,48 @@ def _instrument_token_for_symbol(symbol: str) -> int:
     Symbols in your app are like 'RELIANCE' or 'HDFCBANK'.
     """
     sym = symbol.replace("-", "_").upper().strip()
-    df = _nse_instruments_df()
-    hit = df[df["tradingsymbol"].str.upper() == sym]
-    if hit.empty:
+    tokens = get_instrument_map(_kite(), "NSE")
+    token = tokens.get(sym)
+    if token is None:
         # Try a looser match (sometimes symbols include series)
-        hit = df[df["tradingsymbol"].str.upper().str.startswith(sym)]
-    if hit.empty:
+        token = next((t for ts, t in tokens.items() if ts.startswith(sym)), None)
+    if token is None:
         raise ValueError(f"Could not resolve instrument_token for NSE:{symbol}")
-    return int(hit.iloc[0]["instrument_token"])
+    return int(token)
 
 # -------------------------------
 # Public API
 # -------------------------------
-def fetch_ohlc_data(symbol: str, interval: str = "15minute", days: int = 7) -> pd.DataFrame:
+def prime_kite() -> None:
+    """
+    Build the cached Kite client + NSE instrument map up front, so threads
+    fanning out over fetch_ohlc_data don't race to initialise them.
+    """
+    get_instrument_map(_kite(), "NSE")
+
+
+def fetch_ohlc_data(
+    symbol: str,
+    interval: str = "15minute",
+    days: int = 7,
+    since: Optional[datetime] = None,
+) -> pd.DataFrame:
     """
     Fetch OHLC dataframe for `symbol` from Kite historical API.
     interval: one of ['minute','3minute','5minute','10minute','15minute','30minute','60minute','day']
     days: lookback window (IST)
-    Returns columns: ['date','open','high','low','close','volume'] (indexed by datetime)
+    since: if given, only candles from this time onward are requested (tail fetch)
+    Returns columns: ['open','high','low','close','volume'] indexed by an IST DatetimeIndex
     """
     k = _kite()
     token = _instrument_token_for_symbol(symbol)
     to_dt = datetime.now(IST)
-    from_dt = to_dt - timedelta(days=max(1, int(days)))
+    if since is not None:
+        from_dt = pd.Timestamp(since).to_pydatetime()
+    else:
+        from_dt = to_dt - timedelta(days=max(1, int(days)))
 
+    HIST_LIMITER.wait()
     data = k.historical_data(
         instrument_token=token,
         from_date=from_dt,
@@ -69,19 +106,90 @@ def fetch_ohlc_data(symbol: str, interval: str = "15minute", days: int = 7) -> p
     if not data:
         raise RuntimeError(f"No historical data returned for {symbol} ({interval}, {days}d).")
 
-    df = pd.DataFrame(data)
-    # Normalize columns
-    if "date" in df.columns:
-        df["date"] = pd.to_datetime(df["date"])
-        df.set_index("date", inplace=True)
-        df.sort_index(inplace=True)
-
-    # Ensure expected columns exist
-    for c in ["open", "high", "low", "close", "volume"]:
-        if c not in df.columns:
-            df[c] = np.nan
-
-    return df[["open", "high", "low", "close", "volume"]]
+    # Columnar build straight from the candle records (skips DataFrame's records path);
+    # columns Kite didn't send come back as NaN
+    first = data[0]
+    cols = {
+        c: np.asarray([row[c] for row in data]) if c in first else np.full(len(data), np.nan)
+        for c in ("open", "high", "low", "close", "volume")
+    }
+
+    # Index by IST DatetimeIndex (Kite sends tz-aware datetimes; no generic to_datetime parse)
+    index = None
+    if "date" in first:
+        idx = pd.DatetimeIndex([row["date"] for row in data], name="date")
+        index = idx.tz_localize(IST) if idx.tz is None else idx.tz_convert(IST)
+
+    df = pd.DataFrame(cols, index=index)
+    if index is not None and not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+    return df
+
+
+def _read_cached_ohlc(path: str) -> Optional[pd.DataFrame]:
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_parquet(path, engine="pyarrow")
+    except Exception:
+        # Corrupt/partial cache file: fall back to a full fetch
+        return None
+
+
+def _write_cached_ohlc(path: str, df: pd.DataFrame) -> None:
+    # Best-effort: a failed cache write must not cost us the freshly fetched frame
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        df.to_parquet(tmp, engine="pyarrow", compression="zstd")
+        os.replace(tmp, path)
+    except Exception as e:
+        logger.warning("Could not write OHLC cache %s: %s", path, e)
+
+
+def fetch_ohlc_data_cached(symbol: str, interval: str = "15minute", days: int = 7) -> pd.DataFrame:
+    """
+    Same contract as fetch_ohlc_data, backed by a parquet file per (symbol, interval)
+    under OHLC_CACHE_DIR. When a cached frame exists, only the candles since the last
+    cached one are requested from Kite and merged in; the result is trimmed to `days`.
+    The full window is re-pulled once per IST day, since Kite back-adjusts history
+    for corporate actions and the tail fetch would never see it.
+    """
+    now = datetime.now(IST)
+    today = now.date().isoformat()
+    path = os.path.join(OHLC_CACHE_DIR, f"{symbol.upper().strip()}_{interval}.parquet")
+    cached = _read_cached_ohlc(path)
+    if cached is not None and (
+        not isinstance(cached.index, pd.DatetimeIndex)
+        or cached.index.tz is None
+        or cached.attrs.get(_FULL_FETCH_DAY) != today
+    ):
+        cached = None
+    if cached is not None:
+        # Older cache files carry a fixed +05:30 offset; align with fetch_ohlc_data's IST index
+        cached.index = cached.index.tz_convert(IST)
+
+    df = None
+    if cached is not None and not cached.empty:
+        # Re-request the last couple of candles: the newest cached one may have been in progress.
+        overlap = timedelta(minutes=2 * _INTERVAL_MINUTES.get(interval, 15))
+        fresh = fetch_ohlc_data(symbol, interval=interval, days=days, since=cached.index.max() - overlap)
+        if isinstance(fresh.index, pd.DatetimeIndex):
+            df = pd.concat([cached, fresh])
+            df = df[~df.index.duplicated(keep="last")].sort_index()
+            df.attrs[_FULL_FETCH_DAY] = today
+    if df is None:
+        df = fetch_ohlc_data(symbol, interval=interval, days=days)
+        if not isinstance(df.index, pd.DatetimeIndex):
+            # No candle times from Kite: nothing to trim or merge on, so don't cache it
+            return df
+        df.attrs[_FULL_FETCH_DAY] = today
+
+    cutoff = now - timedelta(days=max(1, int(days)))
+    df = df[df.index >= cutoff]
+
+    _write_cached_ohlc(path, df)
+    return df
 
 
 def calculate_indicators(df: pd.DataFrame) -> dict:
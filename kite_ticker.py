@@ -9,7 +9,9 @@ and writes back [Symbol, LTP, % Change].
 Schedule this script via cron / GitHub Actions.
 """
 
+import os
 import logging
+from functools import lru_cache
 from typing import Dict, List
 
 from kiteconnect import KiteConnect
@@ -21,6 +23,9 @@ from utils.token_store import read_token_row
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 logger = logging.getLogger("kite_ticker")
 
+# Optional spreadsheet key; opening by key skips the Drive name lookup
+LIVE_LTP_SHEET_KEY = os.getenv("LIVE_LTP_SHEET_KEY", "")
+
 
 def _get_kite() -> KiteConnect:
     tr = read_token_row()
@@ -29,9 +34,16 @@ def _get_kite() -> KiteConnect:
     return kite
 
 
-def _load_symbols() -> List[str]:
+@lru_cache(maxsize=1)
+def _ltp_sheet():
+    # Resolved once per run; read and write-back share the handle
     client = get_gspread_client()
-    ws = client.open("LiveLTPStore").sheet1
+    ss = client.open_by_key(LIVE_LTP_SHEET_KEY) if LIVE_LTP_SHEET_KEY else client.open("LiveLTPStore")
+    return ss.sheet1
+
+
+def _load_symbols() -> List[str]:
+    ws = _ltp_sheet()
     values = ws.get_all_values()
     symbols: List[str] = []
     for row in values[1:]:  # skip header
@@ -51,8 +63,7 @@ def _fetch_ltp(kite: KiteConnect, symbols: List[str]) -> Dict[str, dict]:
 
 
 def _update_sheet(ltp_resp: Dict[str, dict]) -> None:
-    client = get_gspread_client()
-    ws = client.open("LiveLTPStore").sheet1
+    ws = _ltp_sheet()
 
     rows = []
     for key, info in ltp_resp.items():
@@ -0,0 +1,130 @@
+# tests/test_indicators.py
+"""
+Parity of the compiled TMV kernel / scorer with the `ta`-based implementation
+it replaced: every last-bar indicator, and the published score fields.
+Install numba (requirements.txt) to run these against the compiled kernels
+that ship rather than the plain-Python fallback.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+ta = pytest.importorskip("ta")
+
+from utils import _njit
+from utils._indicator_kernels import FIELDS, tmv_last, tmv_last_batch
+from utils.indicators import _last_bars, _prepare_ohlc, _score_frame, calculate_scores_batch
+
+
+def _ohlc(seed: int, n: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    spread = np.abs(rng.normal(0, 0.006, (2, n))) * close
+    openp = close * (1 + rng.normal(0, 0.003, n))
+    high = np.maximum(close, openp) + spread[0]
+    low = np.minimum(close, openp) - spread[1]
+    volume = rng.integers(1_000, 100_000, n).astype(float)
+    idx = pd.date_range("2024-01-01 09:15", periods=n, freq="15min", tz="Asia/Kolkata")
+    return pd.DataFrame({"open": openp, "high": high, "low": low, "close": close, "volume": volume}, index=idx)
+
+
+def _ta_last(df: pd.DataFrame) -> dict:
+    close, high, low, vol = df["close"], df["high"], df["low"], df["volume"]
+    macd = ta.trend.MACD(close)
+    return {
+        "close": close.iloc[-1],
+        "ema8": ta.trend.EMAIndicator(close, window=8).ema_indicator().iloc[-1],
+        "ema21": ta.trend.EMAIndicator(close, window=21).ema_indicator().iloc[-1],
+        "macd": macd.macd().iloc[-1],
+        "macd_sig": macd.macd_signal().iloc[-1],
+        "rsi": ta.momentum.RSIIndicator(close, window=14).rsi().iloc[-1],
+        "atr": ta.volatility.AverageTrueRange(high, low, close, window=14).average_true_range().iloc[-1],
+        "adx": ta.trend.ADXIndicator(high, low, close, window=14).adx().iloc[-1],
+        "obv_diff": ta.volume.OnBalanceVolumeIndicator(close, vol).on_balance_volume().diff().iloc[-1],
+        "mfi": ta.volume.MFIIndicator(high, low, close, vol, window=14).money_flow_index().iloc[-1],
+    }
+
+
+def _ta_scores(df: pd.DataFrame) -> dict:
+    # Scoring as the ta-based calculate_scores did it (scalar Python, round())
+    v = _ta_last(df)
+    ema_bull = v["ema8"] > v["ema21"]
+    macd_bull = v["macd"] > v["macd_sig"]
+    dist = (v["close"] - v["ema21"]) / (v["atr"] + 1e-9)
+    trend = max(min((0.6 if ema_bull else 0.0) + max(min(dist * 0.2, 0.4), -0.4), 1.0), 0.0)
+    mom = max(min((0.5 if macd_bull else 0.0) + max(min((v["rsi"] - 50) / 50 * 0.5, 0.5), -0.5), 1.0), 0.0)
+    vol_score = (0.5 if v["obv_diff"] > 0 else 0.0) + (0.5 if v["mfi"] > 50 else 0.0)
+    rev = (0.6 if v["rsi"] >= 70 or v["rsi"] <= 30 else 0.0) + (0.4 if abs(dist) >= 1.5 else 0.0)
+    adx = float(v["adx"])
+    return {
+        "TMV Score": round(float(0.45 * trend + 0.40 * mom + 0.15 * vol_score), 2),
+        "Regime": "Trending" if adx >= 25 else "Developing" if adx >= 18 else "Choppy",
+        "Reversal Probability": round(float(min(rev, 1.0)), 2),
+        "SignalReason": (
+            f"EMA8 {'>' if ema_bull else '<='} EMA21 | MACD {'bull' if macd_bull else 'bear'}"
+            f" | RSI={round(float(v['rsi']), 1)} | ADX={round(adx, 1)}"
+        ),
+    }
+
+
+@pytest.mark.parametrize("n", [80, 81, 120, 400])
+@pytest.mark.parametrize("seed", range(5))
+def test_kernel_matches_ta(seed, n):
+    # Same path calculate_scores_batch takes: prepare, concatenate, tmv_last_batch
+    df = _ohlc(seed, n)
+    frames = {"A": _ohlc(seed + 100, 90), "X": df}
+    got = _last_bars({s: _prepare_ohlc(f) for s, f in frames.items()}).set_index("symbol").loc["X"]
+    expected = _ta_last(df)
+    for name in FIELDS:
+        assert got[name] == pytest.approx(expected[name], rel=1e-9, abs=1e-9), name
+
+
+def test_kernel_accepts_readonly_inputs():
+    # pandas copy-on-write: Series.to_numpy() hands out read-only views
+    df = _ohlc(0, 120)
+    cols = [df[c].to_numpy(dtype=np.float64) for c in ("close", "high", "low", "volume")]
+    assert not cols[0].flags.writeable
+    out = np.empty(len(FIELDS))
+    tmv_last(*cols, out)
+    expected = _ta_last(df)
+    for name, value in zip(FIELDS, out):
+        assert value == pytest.approx(expected[name], rel=1e-9, abs=1e-9), name
+
+
+def test_kernels_compiled_when_numba_installed():
+    pytest.importorskip("numba")
+    assert _njit.types is not None
+    for kernel in (tmv_last, tmv_last_batch):
+        assert kernel.signatures, kernel
+
+
+def test_scores_match_ta():
+    frames = {f"S{seed}": _ohlc(seed, 80 + seed) for seed in range(200)}
+    batch = calculate_scores_batch(frames)
+    for sym, df in frames.items():
+        expected = _ta_scores(df)
+        row = batch.loc[sym]
+        for field, value in expected.items():
+            assert row[field] == value, (sym, field)
+
+
+def test_tmv_rounds_like_python_round():
+    # Bearish stack: trend=0, mom=0, vol_score=0.5 -> 0.075 (binary value just below) -> 0.07
+    last = pd.DataFrame(
+        {
+            "symbol": ["X"],
+            "close": [90.0],
+            "ema8": [95.0],
+            "ema21": [100.0],
+            "macd": [-1.0],
+            "macd_sig": [-0.5],
+            "rsi": [35.0],
+            "atr": [2.0],
+            "adx": [20.0],
+            "obv_diff": [500.0],
+            "mfi": [40.0],
+        }
+    )
+    row = _score_frame(last).loc["X"]
+    assert 0.45 * 0.0 + 0.40 * 0.0 + 0.15 * 0.5 == 0.075
+    assert row["TMV Score"] == 0.07
@@ -1,16 +1,18 @@
 # tmv_updater.py
 import os
-import time
+import json
 import logging
-from datetime import datetime, date
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time as dt_time
+from typing import List, Dict, Any, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import pytz
 
-from utils.google_client import get_gspread_client
-from fetch_ohlc import fetch_ohlc_data
-from utils.indicators import calculate_scores  # you will replace indicators.py below
+from utils.google_client import get_gspread_client, replace_values_requests
+from fetch_ohlc import fetch_ohlc_data_cached, prime_kite
+from utils.indicators import calculate_scores_batch
 
 IST = pytz.timezone("Asia/Kolkata")
 
@@ -24,14 +26,22 @@ LIVESCORES_WS = os.getenv("LIVESCORE_WORKSHEET", "LiveScores")
 
 # Baseline & meta
 BASELINE_WS = os.getenv("BASELINE_WORKSHEET", "TMV_Baseline_915")
+BASELINE_WINDOW_START = dt_time(9, 15)
+BASELINE_WINDOW_END = dt_time(9, 25, 59)  # through the 09:25 minute
 META_WS = os.getenv("META_WORKSHEET", "Meta")
 
 # Quality thresholds
 MAX_CANDLE_AGE_MIN_OK = float(os.getenv("MAX_CANDLE_AGE_MIN_OK", "20"))  # 15m candle should be < ~20m old during market
 MAX_CANDLE_AGE_MIN_STALE = float(os.getenv("MAX_CANDLE_AGE_MIN_STALE", "90"))
 
-# Small backoff to be nice to APIs
-SLEEP_BETWEEN_SYMBOLS_SEC = float(os.getenv("SLEEP_BETWEEN_SYMBOLS_SEC", "0.25"))
+# Watchlist cache, keyed on the spreadsheet's Drive `version` (bumps on every edit)
+# and the trading day. Only used when the watchlist has its own tab: when it
+# shares the output tab, every run rewrites it and there is nothing to cache.
+WATCHLIST_CACHE_PATH = os.getenv("WATCHLIST_CACHE_PATH", ".cache/watchlist.json")
+DRIVE_FILES_URL = "https://www.googleapis.com/drive/v3/files"
+
+# Parallel OHLC fetches (Kite QPS is capped inside fetch_ohlc)
+TMV_WORKERS = int(os.getenv("TMV_WORKERS", "8"))
 
 
 def now_ist() -> datetime:
@@ -42,27 +52,92 @@ def iso(dt: datetime) -> str:
     return dt.replace(microsecond=0).isoformat()
 
 
-def ensure_worksheet(ss, title: str):
+def ensure_worksheet(ss, title: str, worksheets: Dict[str, Any]):
+    """
+    `worksheets` is the {title: Worksheet} map fetched once per run; newly
+    created sheets are added to it.
+    """
+    ws = worksheets.get(title)
+    if ws is None:
+        logger.info("Worksheet '%s' not found. Creating it.", title)
+        ws = worksheets[title] = ss.add_worksheet(title=title, rows=1000, cols=40)
+    return ws
+
+
+def _sheet_version(ss) -> Optional[str]:
+    """
+    Drive metadata GET (fields=version) — much cheaper than downloading the watchlist.
+    Returns None when it can't be read; callers then fall back to the sheet itself.
+    """
+    try:
+        resp = ss.client.request(
+            "get",
+            f"{DRIVE_FILES_URL}/{ss.id}",
+            params={"fields": "version", "supportsAllDrives": True},
+        )
+        version = resp.json().get("version")
+        return str(version) if version is not None else None
+    except Exception as e:
+        logger.warning("Could not read sheet version: %s", e)
+        return None
+
+
+def _read_watchlist_cache() -> Optional[Dict[str, Any]]:
     try:
-        return ss.worksheet(title)
+        with open(WATCHLIST_CACHE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
     except Exception:
-        logger.info("Worksheet '%s' not found. Creating it.", title)
-        return ss.add_worksheet(title=title, rows=1000, cols=40)
+        return None
+
+
+def _write_watchlist_cache(version: Optional[str], day: str, symbols: List[str]) -> None:
+    if not version:
+        return
+    try:
+        os.makedirs(os.path.dirname(WATCHLIST_CACHE_PATH) or ".", exist_ok=True)
+        tmp = f"{WATCHLIST_CACHE_PATH}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": version, "day": day, "symbols": symbols}, f)
+        os.replace(tmp, WATCHLIST_CACHE_PATH)
+    except Exception as e:
+        logger.warning("Could not write watchlist cache: %s", e)
+
+
+def _drop_watchlist_cache() -> None:
+    try:
+        os.remove(WATCHLIST_CACHE_PATH)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning("Could not remove watchlist cache: %s", e)
 
 
-def load_watchlist_symbols(ss) -> List[str]:
-    ws = ss.worksheet(WATCHLIST_WS)
-    values = ws.get_all_values()
-    out: List[str] = []
-    for row in values[1:]:
-        if not row:
-            continue
-        sym = (row[0] or "").strip().upper().replace("-", "_")
-        if sym:
-            out.append(sym)
-    # de-dup preserve order
-    out = list(dict.fromkeys(out))
-    return out
+def _watchlist_cacheable() -> bool:
+    return WATCHLIST_WS != LIVESCORES_WS
+
+
+def _rekey_watchlist_cache(
+    ss, read_version: str, pre_write_version: Optional[str], day: str, symbols: List[str]
+) -> None:
+    """
+    After our own write: `pre_write_version` was read just before it. If it still
+    equals the version `read_inputs` saw, nobody edited the sheet in between, so
+    the version read now reflects our write and the cache moves to it. Otherwise
+    the entry is dropped and the next run re-reads the watchlist. The day key
+    bounds anything that slips in right after the write to one trading day.
+    """
+    if pre_write_version is not None and pre_write_version == read_version:
+        _write_watchlist_cache(_sheet_version(ss), day, symbols)
+    else:
+        _drop_watchlist_cache()
+
+
+def _parse_watchlist(rows: List[List[Any]]) -> List[str]:
+    """Watchlist column A (data rows only) -> normalised, de-duplicated symbols."""
+    col = pd.Series([r[0] if r else "" for r in rows], dtype=object).fillna("").astype(str)
+    col = col.str.strip().str.upper().str.replace("-", "_", regex=False)
+    # drop blanks, de-dup preserve order
+    return col[col != ""].drop_duplicates().tolist()
 
 
 def _candle_time_from_ohlc(df: pd.DataFrame) -> Optional[datetime]:
@@ -89,162 +164,261 @@ def _quality_from_candle_age(age_min: Optional[float]) -> str:
     return "UNKNOWN"
 
 
-def _read_baseline_for_today(bws) -> Dict[str, float]:
+def _parse_baseline(values: List[List[Any]], today_str: str) -> Dict[str, float]:
     """
     Baseline sheet format:
       Date | Symbol | Base TMV
+    Values are read unformatted, so Base TMV arrives as a JSON number.
     """
-    values = bws.get_all_values()
     if not values or len(values) < 2:
         return {}
-    headers = [h.strip() for h in values[0]]
-    rows = values[1:]
+    headers = [str(h).strip() for h in values[0]]
+    rows = [r[: len(headers)] for r in values[1:]]
     df = pd.DataFrame(rows, columns=headers)
     if "Date" not in df.columns or "Symbol" not in df.columns or "Base TMV" not in df.columns:
         return {}
 
-    today_str = date.today().isoformat()
-    df = df[df["Date"] == today_str].copy()
+    df = df[df["Date"] == today_str]
     if df.empty:
         return {}
 
-    df["Base TMV"] = pd.to_numeric(df["Base TMV"], errors="coerce")
-    df = df.dropna(subset=["Base TMV"])
-    return {r["Symbol"].strip().upper(): float(r["Base TMV"]) for _, r in df.iterrows()}
+    base = pd.to_numeric(df["Base TMV"], errors="coerce")
+    ok = base.notna()
+    syms = df.loc[ok, "Symbol"].astype(str).str.strip().str.upper()
+    return dict(zip(syms, base[ok].astype(float)))
 
 
-def _maybe_write_baseline(ss, bws, rows: List[Dict[str, Any]]) -> None:
+def read_inputs(
+    ss, worksheets: Dict[str, Any], today_str: str
+) -> Tuple[List[str], Dict[str, float], Optional[str]]:
+    """
+    Watchlist symbols + today's baseline in ONE values.batchGet (unformatted),
+    plus the sheet version they were read at (None when the watchlist isn't
+    cached). The watchlist range is skipped when the cache is still valid.
+    """
+    if WATCHLIST_WS not in worksheets:
+        raise RuntimeError(f"Watchlist worksheet '{WATCHLIST_WS}' not found.")
+
+    version: Optional[str] = None
+    symbols: Optional[List[str]] = None
+    if _watchlist_cacheable():
+        version = _sheet_version(ss)
+        cached = _read_watchlist_cache()
+        if (
+            version
+            and cached
+            and cached.get("version") == version
+            and cached.get("day") == today_str
+            and cached.get("symbols")
+        ):
+            symbols = list(cached["symbols"])
+
+    ranges = [f"'{BASELINE_WS}'!A:C"]
+    if symbols is None:
+        ranges.append(f"'{WATCHLIST_WS}'!A2:A")
+
+    resp = ss.values_batch_get(
+        ranges,
+        params={
+            "majorDimension": "ROWS",
+            "valueRenderOption": "UNFORMATTED_VALUE",
+            "dateTimeRenderOption": "SERIAL_NUMBER",
+        },
+    )
+    value_ranges = resp.get("valueRanges", [])
+    values = [vr.get("values", []) for vr in value_ranges] + [[]] * (len(ranges) - len(value_ranges))
+
+    baseline_map = _parse_baseline(values[0], today_str)
+    if symbols is None:
+        symbols = _parse_watchlist(values[1])
+        _write_watchlist_cache(version, today_str, symbols)
+    return symbols, baseline_map, version
+
+
+def _baseline_payload(
+    live_df: pd.DataFrame, baseline_map: Dict[str, float], now: datetime
+) -> Optional[List[List[Any]]]:
     """
     If time is within 09:15–09:25 IST and baseline for today is missing,
-    write baseline for all symbols present in current run.
+    return baseline rows for all symbols present in current run (else None).
+    `baseline_map` is today's baseline as read at the start of the run.
     """
-    t = now_ist().time()
-    if not (t.hour == 9 and 15 <= t.minute <= 25):
-        return
+    if not (BASELINE_WINDOW_START <= now.time() <= BASELINE_WINDOW_END):
+        return None
 
-    existing = _read_baseline_for_today(bws)
-    if existing:
-        return  # already captured
+    if baseline_map:
+        return None  # already captured
 
-    today_str = date.today().isoformat()
-    payload = [["Date", "Symbol", "Base TMV"]]
-    for r in rows:
-        sym = r.get("Symbol")
-        tmv = r.get("TMV Score")
-        if sym and tmv is not None:
-            payload.append([today_str, sym, tmv])
+    valid = live_df[live_df["TMV Score"].notna()]
+    if valid.empty:
+        return None
+
+    base_df = pd.DataFrame(
+        {
+            "Date": now.date().isoformat(),
+            "Symbol": valid["Symbol"].to_numpy(),
+            "Base TMV": valid["TMV Score"].to_numpy(),
+        }
+    )
+    return _serialize_for_sheets(base_df, BASELINE_COLS, {"Base TMV"}, numbers_as_text=False)
 
-    if len(payload) <= 1:
-        return
 
-    bws.clear()
-    bws.update("A1", payload)
-    logger.info("✅ Baseline captured for %d symbols (sheet: %s)", len(payload) - 1, BASELINE_WS)
+def _fetch_symbol(sym: str) -> Optional[pd.DataFrame]:
+    try:
+        return fetch_ohlc_data_cached(sym, interval="15minute", days=10)
+    except Exception as e:
+        logger.exception("Error for %s: %s", sym, e)
+        return None
 
 
-def compute_rows(symbols: List[str], baseline_map: Dict[str, float]) -> List[Dict[str, Any]]:
-    rows: List[Dict[str, Any]] = []
-    as_of = now_ist()
+def compute_rows(symbols: List[str], baseline_map: Dict[str, float], as_of: datetime) -> pd.DataFrame:
 
-    for sym in symbols:
-        try:
-            ohlc = fetch_ohlc_data(sym, interval="15minute", days=10)
-            candle_dt = _candle_time_from_ohlc(ohlc)
-            candle_age = None
-            if candle_dt:
-                candle_age = round((as_of - candle_dt).total_seconds() / 60.0, 1)
+    prime_kite()
 
-            scores = calculate_scores(ohlc)  # accepts indexed OHLC (see indicators.py below)
-            if not scores:
-                logger.warning("No scores for %s (insufficient candles or indicator failure)", sym)
-                continue
+    # I/O-bound: overlap the Kite round-trips; results come back in watchlist order
+    with ThreadPoolExecutor(max_workers=max(1, TMV_WORKERS)) as ex:
+        fetched = list(ex.map(_fetch_symbol, symbols))
+    frames: Dict[str, pd.DataFrame] = {sym: df for sym, df in zip(symbols, fetched) if df is not None}
 
-            tmv = scores.get("TMV Score")
-            base = baseline_map.get(sym)
-            tmv_delta = round(float(tmv) - float(base), 2) if (tmv is not None and base is not None) else None
+    # Score the whole watchlist in one vectorized pass
+    scores_df = calculate_scores_batch(frames)
 
-            row = {
-                "Symbol": sym,
+    syms: List[str] = []
+    for sym in frames:
+        if sym in scores_df.index:
+            syms.append(sym)
+        else:
+            logger.warning("No scores for %s (insufficient candles or indicator failure)", sym)
 
-                # Keep both names to prevent app-side mismatch
-                "TMV Score": tmv,
-                "15m TMV Score": tmv,
+    n = len(syms)
+    if n == 0:
+        return pd.DataFrame()
 
-                "Trend Direction": scores.get("Trend Direction"),
-                "Regime": scores.get("Regime"),
-                "Confidence": scores.get("Confidence"),
-                "SignalReason": scores.get("SignalReason"),
-                "Reversal Probability": scores.get("Reversal Probability"),
+    scores = scores_df.loc[syms]
+    tmv = scores["TMV Score"].to_numpy(dtype=float)
 
-                "AsOf": iso(as_of),
-                "CandleTime": iso(candle_dt) if candle_dt else "",
-                "CandleAgeMin": candle_age,
+    # Preallocated per-column arrays, filled by index (no per-row dicts)
+    candle_time = [""] * n
+    candle_age = np.full(n, np.nan)
+    quality = ["UNKNOWN"] * n
 
-                "Base TMV": base if base is not None else "",
-                "TMV Δ": tmv_delta if tmv_delta is not None else "",
+    for i, sym in enumerate(syms):
+        candle_dt = _candle_time_from_ohlc(frames[sym])
+        age = None
+        if candle_dt:
+            age = round((as_of - candle_dt).total_seconds() / 60.0, 1)
+            candle_time[i] = iso(candle_dt)
+            candle_age[i] = age
+        quality[i] = _quality_from_candle_age(age)
 
-                "DataQuality": _quality_from_candle_age(candle_age),
-            }
-            rows.append(row)
+    # Baseline deltas for all symbols at once (NaN where no baseline yet)
+    base_tmv = pd.Series(syms).map(baseline_map).to_numpy(dtype=float)
+    tmv_delta = np.round(tmv - base_tmv, 2)
 
-        except Exception as e:
-            logger.exception("Error for %s: %s", sym, e)
+    # float32 is ample for sheet display and halves numeric memory / formatting work
+    f32 = np.float32
 
-        time.sleep(SLEEP_BETWEEN_SYMBOLS_SEC)
+    return pd.DataFrame(
+        {
+            "Symbol": syms,
 
-    return rows
+            # Keep both names to prevent app-side mismatch
+            "TMV Score": tmv.astype(f32),
+            "15m TMV Score": tmv.astype(f32),
 
+            "Trend Direction": scores["Trend Direction"].to_numpy(),
+            "Regime": scores["Regime"].to_numpy(),
+            "Confidence": scores["Confidence"].to_numpy(),
+            "SignalReason": scores["SignalReason"].to_numpy(),
+            "Reversal Probability": scores["Reversal Probability"].to_numpy(dtype=f32),
 
-def write_table(ws, rows: List[Dict[str, Any]]) -> None:
-    if not rows:
-        ws.clear()
-        return
+            "AsOf": iso(as_of),
+            "CandleTime": candle_time,
+            "CandleAgeMin": candle_age.astype(f32),
 
-    # Stable column order
-    cols = [
-        "Symbol",
-        "15m TMV Score",
-        "TMV Score",
-        "TMV Δ",
-        "Base TMV",
-        "Trend Direction",
-        "Regime",
-        "Confidence",
-        "SignalReason",
-        "Reversal Probability",
-        "CandleTime",
-        "CandleAgeMin",
-        "AsOf",
-        "DataQuality",
-    ]
+            "Base TMV": base_tmv.astype(f32),
+            "TMV Δ": tmv_delta.astype(f32),
 
-    df = pd.DataFrame(rows)
+            "DataQuality": quality,
+        }
+    )
+
+
+# Stable LiveScores column order
+LIVESCORE_COLS = [
+    "Symbol",
+    "15m TMV Score",
+    "TMV Score",
+    "TMV Δ",
+    "Base TMV",
+    "Trend Direction",
+    "Regime",
+    "Confidence",
+    "SignalReason",
+    "Reversal Probability",
+    "CandleTime",
+    "CandleAgeMin",
+    "AsOf",
+    "DataQuality",
+]
+LIVESCORE_NUMERIC_COLS = {"15m TMV Score", "TMV Score", "TMV Δ", "Base TMV", "Reversal Probability", "CandleAgeMin"}
+
+BASELINE_COLS = ["Date", "Symbol", "Base TMV"]
+
+
+def _serialize_for_sheets(
+    df: pd.DataFrame, cols: List[str], numeric_cols: set, numbers_as_text: bool = True
+) -> List[List[Any]]:
+    """
+    Header + rows for `cols` (missing columns left blank), built column-wise
+    straight from the frame's arrays — no reordered copy, no astype(str) frame.
+    Numeric columns are rounded to 2dp (as text, or as numbers when
+    numbers_as_text=False); NaN/None become "".
+    """
+    n = len(df)
+    col_lists = []
     for c in cols:
         if c not in df.columns:
-            df[c] = ""
+            col_lists.append([""] * n)
+        elif c in numeric_cols:
+            num = pd.to_numeric(df[c], errors="coerce")
+            if numbers_as_text:
+                arr = np.round(num.to_numpy(dtype=np.float32), 2)
+                col_lists.append(np.where(np.isnan(arr), "", arr.astype(str)).tolist())
+            else:
+                arr = np.round(num.to_numpy(dtype=np.float64), 2)
+                col_lists.append(["" if v != v else v for v in arr.tolist()])
+        else:
+            col_lists.append(["" if v is None or v != v else str(v) for v in df[c].tolist()])
+
+    return [list(cols)] + [list(r) for r in zip(*col_lists)]
+
+
+def _table_values(df: pd.DataFrame) -> List[List[str]]:
+    if df.empty:
+        return []
+    return _serialize_for_sheets(df, LIVESCORE_COLS, LIVESCORE_NUMERIC_COLS)
 
-    df = df[cols].copy()
 
-    # Light rounding for display
-    for c in ["15m TMV Score", "TMV Score", "TMV Δ", "Base TMV", "Reversal Probability", "CandleAgeMin"]:
-        if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce").round(2)
+def write_sheets(ss, updates: List[Tuple[Any, List[List[Any]]]]) -> None:
+    """
+    Replace the contents of several worksheets in ONE spreadsheets.batchUpdate
+    (one whole-sheet updateCells per worksheet, grid grown first where needed).
+    """
+    requests = [r for ws, values in updates for r in replace_values_requests(ws, values)]
+    if requests:
+        ss.batch_update({"requests": requests})
 
-    values = [df.columns.tolist()] + df.fillna("").astype(str).values.tolist()
 
-    ws.clear()
-    ws.update("A1", values)
+def _meta_values(now: datetime, status: str, message: str = "") -> List[List[str]]:
+    return [
+        ["LastRunIST", "Status", "Message"],
+        [iso(now), status, message[:200]],
+    ]
 
 
-def write_meta(meta_ws, status: str, message: str = "") -> None:
-    meta_ws.clear()
-    meta_ws.update(
-        "A1",
-        [
-            ["LastRunIST", "Status", "Message"],
-            [iso(now_ist()), status, message[:200]],
-        ],
-    )
+def write_meta(ss, meta_ws, now: datetime, status: str, message: str = "") -> None:
+    write_sheets(ss, [(meta_ws, _meta_values(now, status, message))])
 
 
 def main():
@@ -254,36 +428,55 @@ def main():
     gc = get_gspread_client()
     ss = gc.open_by_key(BACKGROUND_SHEET_KEY)
 
-    lives_ws = ensure_worksheet(ss, LIVESCORES_WS)
-    base_ws = ensure_worksheet(ss, BASELINE_WS)
-    meta_ws = ensure_worksheet(ss, META_WS)
+    # One metadata fetch for all tabs (ss.worksheet() re-lists them on every call)
+    worksheets = {w.title: w for w in ss.worksheets()}
+    lives_ws = ensure_worksheet(ss, LIVESCORES_WS, worksheets)
+    base_ws = ensure_worksheet(ss, BASELINE_WS, worksheets)
+    meta_ws = ensure_worksheet(ss, META_WS, worksheets)
+
+    # One clock read per run; every step below works off the same instant
+    now = now_ist()
+    today_str = now.date().isoformat()
 
     try:
-        symbols = load_watchlist_symbols(ss)
+        symbols, baseline_map, read_version = read_inputs(ss, worksheets, today_str)
         if not symbols:
-            write_meta(meta_ws, "ERROR", "Watchlist empty.")
+            write_meta(ss, meta_ws, now, "ERROR", "Watchlist empty.")
             logger.error("Watchlist empty. Aborting.")
             return
 
-        baseline_map = _read_baseline_for_today(base_ws)
+        live_df = compute_rows(symbols, baseline_map, now)
 
-        rows = compute_rows(symbols, baseline_map)
-
-        # Optionally capture baseline around 9:15
-        _maybe_write_baseline(ss, base_ws, rows)
-
-        if not rows:
-            write_meta(meta_ws, "ERROR", "No rows computed (all failed).")
+        if live_df.empty:
+            write_meta(ss, meta_ws, now, "ERROR", "No rows computed (all failed).")
             logger.error("No rows computed. Aborting.")
             return
 
-        write_table(lives_ws, rows)
-        write_meta(meta_ws, "OK", f"Wrote {len(rows)} rows to {LIVESCORES_WS}")
-
-        logger.info("✅ TMV updater completed: %d rows", len(rows))
+        # Optionally capture baseline around 9:15
+        base_payload = _baseline_payload(live_df, baseline_map, now)
+        if base_payload:
+            # Captured this run: reflect it in LiveScores right away
+            live_df["Base TMV"] = live_df["TMV Score"]
+            live_df["TMV Δ"] = np.where(live_df["TMV Score"].notna(), 0.0, np.nan)
+
+        # LiveScores + Meta (+ Baseline) in one round-trip
+        updates = [(lives_ws, _table_values(live_df))]
+        if base_payload:
+            updates.append((base_ws, base_payload))
+        updates.append((meta_ws, _meta_values(now, "OK", f"Wrote {len(live_df)} rows to {LIVESCORES_WS}")))
+        # Our own write bumps the sheet version; bracket it so the cache can follow
+        pre_write_version = _sheet_version(ss) if read_version else None
+        write_sheets(ss, updates)
+        if read_version:
+            _rekey_watchlist_cache(ss, read_version, pre_write_version, today_str, symbols)
+
+        if base_payload:
+            logger.info("✅ Baseline captured for %d symbols (sheet: %s)", len(base_payload) - 1, BASELINE_WS)
+
+        logger.info("✅ TMV updater completed: %d rows", len(live_df))
 
     except Exception as e:
-        write_meta(meta_ws, "ERROR", str(e))
+        write_meta(ss, meta_ws, now, "ERROR", str(e))
         raise
 
 
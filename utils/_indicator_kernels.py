@@ -0,0 +1,162 @@
+# utils/_indicator_kernels.py
+"""
+Compiled indicator kernels: plain float64 numpy arrays in, last-bar scalars
+out. No pandas here; utils/indicators.py does the frame handling and scoring.
+"""
+import numpy as np
+
+from ._njit import njit, prange, types
+
+# Smoothing constants: module globals are frozen into the kernel as literals by numba
+_A_EMA8 = 2.0 / (8 + 1)
+_A_EMA21 = 2.0 / (21 + 1)
+_A_EMA12 = 2.0 / (12 + 1)  # MACD fast
+_A_EMA26 = 2.0 / (26 + 1)  # MACD slow
+_A_SIG9 = 2.0 / (9 + 1)  # MACD signal
+_A_WILDER14 = 1.0 / 14  # RSI
+_W14 = 14  # ATR / ADX window (SMA seed, then Wilder smoothing, as in `ta`)
+_MACD_SLOW = 26  # MACD line exists (min_periods) from bar _MACD_SLOW - 1; signal seeds there
+_MFI_WINDOW = 14
+
+# Last-bar indicator values produced by tmv_last (column order of its `out` row)
+FIELDS = ("close", "ema8", "ema21", "macd", "macd_sig", "rsi", "atr", "adx", "obv_diff", "mfi")
+
+
+# Explicit signatures: compiled eagerly (and cached) at import instead of on the
+# first call, and no argument-type dispatch per call. Inputs must be contiguous
+# float64 and are typed read-only, so both writable arrays and the read-only views
+# pandas copy-on-write hands out from to_numpy() bind; only `out` must be writable.
+if types is not None:
+    _IN = types.Array(types.float64, 1, "C", readonly=True)
+    _TMV_LAST_SIG = types.void(_IN, _IN, _IN, _IN, types.float64[::1])
+    _TMV_LAST_BATCH_SIG = types.void(
+        _IN, _IN, _IN, _IN, types.Array(types.int64, 1, "C", readonly=True), types.float64[:, ::1]
+    )
+else:
+    _TMV_LAST_SIG = _TMV_LAST_BATCH_SIG = None
+
+
+@njit(_TMV_LAST_SIG, cache=True)
+def tmv_last(close, high, low, volume, out):
+    """
+    Single forward pass over one symbol's OHLCV arrays. Writes the last-bar
+    value of every indicator used by the TMV score into `out` (see FIELDS).
+    Mirrors the `ta` library step for step: EMAs follow pandas ewm(adjust=False),
+    the MACD signal seeds at the first full MACD value, RSI uses Wilder's ewm,
+    and ATR/ADX seed with a 14-bar mean before Wilder smoothing.
+    """
+    n = close.shape[0]
+
+    ema8 = close[0]
+    ema21 = close[0]
+    ema12 = close[0]
+    ema26 = close[0]
+    sig = np.nan
+    avg_gain = 0.0
+    avg_loss = 0.0
+
+    # ATR(14): bar 0's true range is high - low; mean of bars 0..13 seeds it
+    tr_sum = high[0] - low[0]
+    atr = np.nan
+
+    # ADX(14): sums over bars 1..14 seed TR/+DM/-DM; the first 14 DX values seed ADX
+    trs = 0.0
+    dip_s = 0.0
+    din_s = 0.0
+    dx_sum = 0.0
+    adx = np.nan
+
+    for i in range(1, n):
+        c = close[i]
+        pc = close[i - 1]
+
+        # Trend / MACD EMAs
+        ema8 += _A_EMA8 * (c - ema8)
+        ema21 += _A_EMA21 * (c - ema21)
+        ema12 += _A_EMA12 * (c - ema12)
+        ema26 += _A_EMA26 * (c - ema26)
+        if i == _MACD_SLOW - 1:
+            sig = ema12 - ema26
+        elif i >= _MACD_SLOW:
+            sig += _A_SIG9 * ((ema12 - ema26) - sig)
+
+        # RSI(14)
+        d = c - pc
+        avg_gain += _A_WILDER14 * (max(d, 0.0) - avg_gain)
+        avg_loss += _A_WILDER14 * (max(-d, 0.0) - avg_loss)
+
+        # ATR(14)
+        tr = max(high[i] - low[i], abs(high[i] - pc), abs(low[i] - pc))
+        if i < _W14:
+            tr_sum += tr
+            if i == _W14 - 1:
+                atr = tr_sum / _W14
+        else:
+            atr = (atr * (_W14 - 1) + tr) / _W14
+
+        # ADX(14)
+        adx_tr = max(high[i], pc) - min(low[i], pc)
+        up = high[i] - high[i - 1]
+        dn = low[i - 1] - low[i]
+        pdm = up if (up > dn and up > 0.0) else 0.0
+        mdm = dn if (dn > up and dn > 0.0) else 0.0
+        if i <= _W14:
+            trs += adx_tr
+            dip_s += pdm
+            din_s += mdm
+        else:
+            trs = trs - trs / _W14 + adx_tr
+            dip_s = dip_s - dip_s / _W14 + pdm
+            din_s = din_s - din_s / _W14 + mdm
+
+        if i >= _W14:
+            dip = 100.0 * (dip_s / trs) if trs != 0.0 else 0.0
+            din = 100.0 * (din_s / trs) if trs != 0.0 else 0.0
+            dx = 100.0 * abs((dip - din) / (dip + din)) if dip + din != 0.0 else 0.0
+            if i < 2 * _W14:
+                dx_sum += dx
+                if i == 2 * _W14 - 1:
+                    adx = dx_sum / _W14
+            else:
+                adx = (adx * (_W14 - 1) + dx) / _W14
+
+    # MFI(14): only the last window matters
+    pos = 0.0
+    neg = 0.0
+    for i in range(max(1, n - _MFI_WINDOW), n):
+        tp = (high[i] + low[i] + close[i]) / 3.0
+        tp_prev = (high[i - 1] + low[i - 1] + close[i - 1]) / 3.0
+        if tp > tp_prev:
+            pos += tp * volume[i]
+        elif tp < tp_prev:
+            neg += tp * volume[i]
+
+    out[0] = close[n - 1]
+    out[1] = ema8
+    out[2] = ema21
+    out[3] = ema12 - ema26
+    out[4] = sig
+    if avg_loss != 0.0:
+        out[5] = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    else:
+        out[5] = 100.0
+    out[6] = atr
+    out[7] = adx
+    out[8] = -volume[n - 1] if close[n - 1] < close[n - 2] else volume[n - 1]
+    if neg > 0.0:
+        out[9] = 100.0 - 100.0 / (1.0 + pos / neg)
+    else:
+        out[9] = 100.0 if pos > 0.0 else np.nan
+
+
+@njit(_TMV_LAST_BATCH_SIG, parallel=True, cache=True)
+def tmv_last_batch(close, high, low, volume, offsets, out):
+    """
+    tmv_last for many symbols at once. Arrays are all symbols' bars laid end to
+    end; symbol i owns [offsets[i], offsets[i + 1]) and writes out[i].
+    Symbols are independent, so they run in parallel (no GIL) under numba.
+    """
+    for i in prange(offsets.shape[0] - 1):
+        s = offsets[i]
+        e = offsets[i + 1]
+        tmv_last(close[s:e], high[s:e], low[s:e], volume[s:e], out[i])
@@ -0,0 +1,17 @@
+# utils/_njit.py
+"""
+Numba shim: use numba's njit/prange when installed, otherwise the decorated
+kernels run as plain Python (same results, just slower). `types` is None
+without numba; kernels build their explicit signatures only when it is set.
+"""
+
+try:
+    from numba import njit, prange, types  # type: ignore
+except ImportError:
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda f: f
+
+    prange = range
+    types = None
@@ -1,10 +1,17 @@
 # utils/google_client.py
-import os, json
-from typing import Dict, Any
+import os
+import base64
+from functools import lru_cache
+from typing import Dict, Any, List
 
 import gspread
 from google.oauth2.service_account import Credentials
 
+try:
+    import orjson as _json  # type: ignore  # faster loads when available
+except ImportError:
+    import json as _json
+
 try:
     import streamlit as st  # type: ignore
 except Exception:
@@ -15,16 +22,40 @@ SCOPES = [
     "https://www.googleapis.com/auth/drive",
 ]
 
+@lru_cache(maxsize=2)
+def _parse_service_account(raw: str) -> Dict[str, Any]:
+    """
+    Accepts either:
+      - plain JSON string
+      - base64-encoded JSON string
+    Returns dict usable by Credentials.from_service_account_info
+    """
+    raw = raw.strip()
+    # Plain JSON is an object literal; anything else is taken as base64
+    if raw.startswith("{"):
+        try:
+            return _json.loads(raw)
+        except ValueError:  # JSONDecodeError for both orjson and json
+            pass
+
+    # Try base64 decode -> JSON (both parsers take the decoded bytes directly)
+    try:
+        return _json.loads(base64.b64decode(raw))
+    except Exception as e:
+        raise RuntimeError(
+            "GOOGLE_SERVICE_ACCOUNT_JSON is neither valid JSON nor base64-encoded JSON."
+        ) from e
+
 def _load_service_account_info() -> Dict[str, Any]:
     # 1) env var (works for Streamlit + jobs)
     raw = os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON")
-    if raw:
-        return json.loads(raw)
+    if raw and raw.strip():
+        return _parse_service_account(raw)
 
-    # 2) Streamlit secrets direct JSON string
+    # 2) Streamlit secrets direct JSON (or base64 JSON) string
     if st is not None:
         if "GOOGLE_SERVICE_ACCOUNT_JSON" in st.secrets:
-            return json.loads(st.secrets["GOOGLE_SERVICE_ACCOUNT_JSON"])
+            return _parse_service_account(st.secrets["GOOGLE_SERVICE_ACCOUNT_JSON"])
 
         # 3) common alternate key name
         if "gcp_service_account" in st.secrets:
@@ -38,7 +69,45 @@ def _load_service_account_info() -> Dict[str, Any]:
         "or environment variables."
     )
 
+@lru_cache(maxsize=1)
 def get_gspread_client() -> gspread.Client:
+    # One authorized client per process; google-auth refreshes the token itself
     info = _load_service_account_info()
     creds = Credentials.from_service_account_info(info, scopes=SCOPES)
     return gspread.authorize(creds)
+
+
+def cell_data(v: Any) -> Dict[str, Any]:
+    """Python value -> Sheets CellData (blank for None/""/NaN)."""
+    if v is None or v == "" or (isinstance(v, float) and v != v):
+        return {}
+    if isinstance(v, bool):
+        return {"userEnteredValue": {"boolValue": v}}
+    if isinstance(v, (int, float)):
+        return {"userEnteredValue": {"numberValue": v}}
+    return {"userEnteredValue": {"stringValue": str(v)}}
+
+
+def replace_values_requests(ws, values: List[List[Any]]) -> List[Dict[str, Any]]:
+    """
+    spreadsheets.batchUpdate requests that write `values` from A1 and clear every
+    other cell's value in the sheet: ws.clear() + ws.update("A1", values) in one.
+    updateCells never grows the grid, so appendDimension requests come first when
+    `values` is longer or wider than the sheet (as ws.update did implicitly).
+    """
+    requests: List[Dict[str, Any]] = []
+    n_rows = len(values)
+    n_cols = max((len(row) for row in values), default=0)
+    for dim, need, have in (("ROWS", n_rows, ws.row_count), ("COLUMNS", n_cols, ws.col_count)):
+        if need > have:
+            requests.append({"appendDimension": {"sheetId": ws.id, "dimension": dim, "length": need - have}})
+    requests.append(
+        {
+            "updateCells": {
+                "range": {"sheetId": ws.id},
+                "rows": [{"values": [cell_data(v) for v in row]} for row in values],
+                "fields": "userEnteredValue",
+            }
+        }
+    )
+    return requests
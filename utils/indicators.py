@@ -1,128 +1,141 @@
 # utils/indicators.py
+from typing import Dict, Optional
+
+import numpy as np
 import pandas as pd
 
-def calculate_scores(ohlc: pd.DataFrame) -> dict:
-    """
-    Input: OHLC dataframe indexed by datetime with columns:
-      open, high, low, close, volume
-    Output: dict with TMV Score + supporting fields.
+from ._indicator_kernels import FIELDS, tmv_last_batch
+
+MIN_CANDLES = 80  # not enough candles for stable MACD/ADX etc. below this
 
-    Uses 'ta' library (installable) and avoids pandas_ta.
-    """
-    if ohlc is None or ohlc.empty:
-        return {}
 
-    df = ohlc.copy()
+def _prepare_ohlc(ohlc: pd.DataFrame) -> Optional[pd.DataFrame]:
+    # Too-short frames are rejected before any index/sort work
+    if ohlc is None or len(ohlc) < MIN_CANDLES:
+        return None
+
+    df = ohlc
     if not isinstance(df.index, pd.DatetimeIndex):
         # Try to find date column fallback
         if "date" in df.columns:
-            df["date"] = pd.to_datetime(df["date"])
-            df = df.set_index("date")
+            df = df.set_index(pd.DatetimeIndex(df["date"]))
         else:
-            return {}
-
-    df = df.sort_index()
-    if len(df) < 80:
-        return {}  # not enough candles for stable MACD/ADX etc.
+            return None
 
-    import ta
+    # fetch_ohlc_data already returns a sorted DatetimeIndex; only sort (copy) when needed
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+    return df
 
-    close = df["close"].astype(float)
-    high = df["high"].astype(float)
-    low  = df["low"].astype(float)
-    vol  = df["volume"].astype(float)
 
-    # Indicators
-    ema8  = ta.trend.EMAIndicator(close, window=8).ema_indicator()
-    ema21 = ta.trend.EMAIndicator(close, window=21).ema_indicator()
-
-    macd = ta.trend.MACD(close)
-    macd_line = macd.macd()
-    macd_sig  = macd.macd_signal()
-    macd_hist = macd.macd_diff()
-
-    rsi = ta.momentum.RSIIndicator(close, window=14).rsi()
-    adx = ta.trend.ADXIndicator(high, low, close, window=14).adx()
-
-    atr = ta.volatility.AverageTrueRange(high, low, close, window=14).average_true_range()
-
-    # Volume proxies
-    obv = ta.volume.OnBalanceVolumeIndicator(close, vol).on_balance_volume()
-    mfi = ta.volume.MFIIndicator(high, low, close, vol, window=14).money_flow_index()
+def _score_frame(last: pd.DataFrame, with_reason: bool = True) -> pd.DataFrame:
+    """
+    TMV score + supporting fields from the last-bar indicator row of each symbol.
+    with_reason=False leaves SignalReason blank (skips the per-symbol string formatting).
+    """
+    ema8 = last["ema8"].to_numpy()
+    ema21 = last["ema21"].to_numpy()
+    macd = last["macd"].to_numpy()
+    macd_sig = last["macd_sig"].to_numpy()
+    macd_hist = macd - macd_sig
+    rsi = last["rsi"].to_numpy()
+    adx = last["adx"].to_numpy()
 
-    # Latest
-    last = -1
+    ema_bull = ema8 > ema21
+    macd_bull = macd > macd_sig
 
-    # Trend score (0–1)
-    trend = 0.0
-    if ema8.iloc[last] > ema21.iloc[last]:
-        trend += 0.6
-    # Normalize price distance from EMA21 using ATR
-    dist = (close.iloc[last] - ema21.iloc[last]) / (atr.iloc[last] + 1e-9)
-    trend += max(min(dist * 0.2, 0.4), -0.4)  # clamp
-    trend = max(min(trend, 1.0), 0.0)
+    # Trend score (0–1): EMA stack + price distance from EMA21 normalised by ATR
+    dist = (last["close"].to_numpy() - ema21) / (last["atr"].to_numpy() + 1e-9)
+    trend = np.clip(np.where(ema_bull, 0.6, 0.0) + np.clip(dist * 0.2, -0.4, 0.4), 0.0, 1.0)
 
-    # Momentum score (0–1)
-    mom = 0.0
-    if macd_line.iloc[last] > macd_sig.iloc[last]:
-        mom += 0.5
-    # RSI centered at 50
-    mom += max(min((rsi.iloc[last] - 50) / 50 * 0.5, 0.5), -0.5)
-    mom = max(min(mom, 1.0), 0.0)
+    # Momentum score (0–1): MACD cross + RSI centered at 50
+    mom = np.clip(np.where(macd_bull, 0.5, 0.0) + np.clip((rsi - 50) / 50 * 0.5, -0.5, 0.5), 0.0, 1.0)
 
     # Volume score (0–1)
-    vol_score = 0.0
-    if obv.diff().iloc[last] > 0:
-        vol_score += 0.5
-    if mfi.iloc[last] > 50:
-        vol_score += 0.5
+    vol_score = np.where(last["obv_diff"].to_numpy() > 0, 0.5, 0.0) + np.where(last["mfi"].to_numpy() > 50, 0.5, 0.0)
 
     # TMV weighted score
-    tmv = 0.45 * trend + 0.40 * mom + 0.15 * vol_score
-    tmv = round(float(tmv), 2)
+    # Python round() per value: it rounds the exact binary value (0.075 -> 0.07),
+    # np.round scales by 100 first and can land on the other side of a tie
+    tmv = [round(float(v), 2) for v in 0.45 * trend + 0.40 * mom + 0.15 * vol_score]
 
     # Regime / confidence
-    adx_v = float(adx.iloc[last])
-    if adx_v >= 25:
-        regime = "Trending"
-        confidence = "High"
-    elif adx_v >= 18:
-        regime = "Developing"
-        confidence = "Medium"
-    else:
-        regime = "Choppy"
-        confidence = "Low"
+    regime = np.select([adx >= 25, adx >= 18], ["Trending", "Developing"], "Choppy")
+    confidence = np.select([adx >= 25, adx >= 18], ["High", "Medium"], "Low")
 
     # Trend direction label
-    if ema8.iloc[last] > ema21.iloc[last] and macd_hist.iloc[last] > 0:
-        direction = "Bullish"
-    elif ema8.iloc[last] < ema21.iloc[last] and macd_hist.iloc[last] < 0:
-        direction = "Bearish"
-    else:
-        direction = "Neutral"
+    direction = np.select(
+        [ema_bull & (macd_hist > 0), (ema8 < ema21) & (macd_hist < 0)],
+        ["Bullish", "Bearish"],
+        "Neutral",
+    )
 
-    # Reversal probability (simple but useful)
-    # Higher if RSI extreme or big mean-reversion distance
-    rev = 0.0
-    if rsi.iloc[last] >= 70 or rsi.iloc[last] <= 30:
-        rev += 0.6
-    if abs(dist) >= 1.5:
-        rev += 0.4
-    rev = round(float(min(rev, 1.0)), 2)
+    # Reversal probability: higher if RSI extreme or big mean-reversion distance
+    rev = np.where((rsi >= 70) | (rsi <= 30), 0.6, 0.0) + np.where(np.abs(dist) >= 1.5, 0.4, 0.0)
+    rev = [round(float(v), 2) for v in np.minimum(rev, 1.0)]
 
     # Human-readable reason
-    reason_parts = []
-    reason_parts.append(f"EMA8 {'>' if ema8.iloc[last] > ema21.iloc[last] else '<='} EMA21")
-    reason_parts.append(f"MACD {'bull' if macd_line.iloc[last] > macd_sig.iloc[last] else 'bear'}")
-    reason_parts.append(f"RSI={round(float(rsi.iloc[last]),1)}")
-    reason_parts.append(f"ADX={round(adx_v,1)}")
-    signal_reason = " | ".join(reason_parts)
-
-    return {
-        "TMV Score": tmv,
-        "Trend Direction": direction,
-        "Regime": regime,
-        "Confidence": confidence,
-        "SignalReason": signal_reason,
-        "Reversal Probability": rev,
-    }
+    if with_reason:
+        signal_reason = [
+            f"EMA8 {'>' if e else '<='} EMA21 | MACD {'bull' if m else 'bear'} | RSI={round(float(r), 1)} | ADX={round(float(a), 1)}"
+            for e, m, r, a in zip(ema_bull, macd_bull, rsi, adx)
+        ]
+    else:
+        signal_reason = [""] * len(tmv)
+
+    return pd.DataFrame(
+        {
+            "TMV Score": tmv,
+            "Trend Direction": direction,
+            "Regime": regime,
+            "Confidence": confidence,
+            "SignalReason": signal_reason,
+            "Reversal Probability": rev,
+        },
+        index=last["symbol"].to_numpy(),
+    )
+
+
+def _last_bars(prepared: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Last-bar indicator values (FIELDS columns + symbol) for already-prepared frames."""
+    # Jagged SoA: every symbol's bars end to end + offsets, scored in one kernel call
+    dfs = list(prepared.values())
+    offsets = np.zeros(len(dfs) + 1, dtype=np.int64)
+    np.cumsum([len(df) for df in dfs], out=offsets[1:])
+
+    def _col(name: str) -> np.ndarray:
+        return np.concatenate([df[name].to_numpy(dtype=np.float64) for df in dfs])
+
+    out = np.full((len(dfs), len(FIELDS)), np.nan)
+    tmv_last_batch(_col("close"), _col("high"), _col("low"), _col("volume"), offsets, out)
+
+    last = pd.DataFrame(out, columns=list(FIELDS))
+    last["symbol"] = list(prepared.keys())
+    return last
+
+
+def calculate_scores_batch(frames: Dict[str, pd.DataFrame], with_reason: bool = True) -> pd.DataFrame:
+    """
+    Input: {symbol: OHLC dataframe} (same shape as calculate_scores expects).
+    Output: one row per scorable symbol (index = symbol) with the same fields
+    calculate_scores returns. Symbols with too few candles are left out.
+    Pass with_reason=False when SignalReason isn't displayed.
+    """
+    prepared = {s: df for s, df in ((s, _prepare_ohlc(df)) for s, df in frames.items()) if df is not None}
+    if not prepared:
+        return pd.DataFrame()
+    return _score_frame(_last_bars(prepared), with_reason=with_reason)
+
+
+def calculate_scores(ohlc: pd.DataFrame, with_reason: bool = True) -> dict:
+    """
+    Input: OHLC dataframe indexed by datetime with columns:
+      open, high, low, close, volume
+    Output: dict with TMV Score + supporting fields.
+
+    Single-symbol wrapper around calculate_scores_batch.
+    """
+    scores = calculate_scores_batch({"": ohlc}, with_reason=with_reason)
+    if scores.empty:
+        return {}
+    return scores.iloc[0].to_dict()
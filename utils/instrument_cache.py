@@ -0,0 +1,117 @@
+# utils/instrument_cache.py
+"""
+Daily on-disk cache of Kite's tradingsymbol -> instrument_token map, so the
+instruments dump (several MB of CSV) is downloaded at most once per trading day,
+plus a persistent cache of tokens resolved through batched LTP lookups.
+"""
+import os
+import json
+import glob
+import shelve
+import logging
+import threading
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List
+
+import pytz
+
+IST = pytz.timezone("Asia/Kolkata")
+INSTRUMENT_CACHE_DIR = os.getenv("INSTRUMENT_CACHE_DIR", ".cache/instruments")
+
+# symbol -> instrument_token from LTP lookups, kept in memory and on disk for the
+# current trading day only (like the instruments dump above)
+INSTRUMENT_TOKEN_DB = os.getenv("INSTRUMENT_TOKEN_DB", ".cache/instrument_tokens")
+_TOKENS_DAY_KEY = "__day__"  # shelf entry recording the day its tokens were resolved
+_TOKENS: Dict[str, int] = {}
+_tokens_day = ""
+_TOKENS_LOCK = threading.Lock()  # fetch threads may resolve concurrently; shelve is not thread-safe
+
+logger = logging.getLogger(__name__)
+
+
+def _cache_path(exchange: str, day: str) -> str:
+    return os.path.join(INSTRUMENT_CACHE_DIR, f"{exchange}_{day}.json")
+
+
+def _save(exchange: str, day: str, mapping: Dict[str, int]) -> None:
+    try:
+        os.makedirs(INSTRUMENT_CACHE_DIR, exist_ok=True)
+        path = _cache_path(exchange, day)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(mapping, f)
+        os.replace(tmp, path)
+        # Older days are never read again
+        for old in glob.glob(os.path.join(INSTRUMENT_CACHE_DIR, f"{exchange}_*.json")):
+            if old != path:
+                os.remove(old)
+    except Exception as e:
+        logger.warning("Could not write instrument cache: %s", e)
+
+
+@lru_cache(maxsize=4)
+def get_instrument_map(kite, exchange: str = "NSE") -> Dict[str, int]:
+    """
+    {TRADINGSYMBOL: instrument_token} for `exchange`, in Kite's dump order
+    (first listing wins). Read from today's cache file when present.
+    """
+    day = datetime.now(IST).strftime("%Y%m%d")
+    path = _cache_path(exchange, day)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        pass
+
+    mapping: Dict[str, int] = {}
+    for inst in kite.instruments(exchange=exchange):
+        mapping.setdefault(str(inst["tradingsymbol"]).upper(), int(inst["instrument_token"]))
+
+    _save(exchange, day, mapping)
+    return mapping
+
+
+def ltp_instrument_tokens(kite, symbols: List[str]) -> Dict[str, int]:
+    """
+    Resolve instrument tokens, served from memory / the on-disk shelf when known
+    for today. Only unknown symbols hit Kite, all in ONE LTP call; symbols Kite
+    doesn't know are simply absent from the result.
+    """
+    global _tokens_day
+    day = datetime.now(IST).strftime("%Y%m%d")
+    with _TOKENS_LOCK:
+        if _tokens_day != day:
+            _TOKENS.clear()
+            _tokens_day = day
+
+        missing = [s for s in symbols if s not in _TOKENS]
+        if missing:
+            try:
+                with shelve.open(INSTRUMENT_TOKEN_DB) as db:
+                    if db.get(_TOKENS_DAY_KEY) == day:
+                        _TOKENS.update({s: db[s] for s in missing if s in db})
+            except Exception:
+                pass
+            missing = [s for s in missing if s not in _TOKENS]
+
+        if missing:
+            resp = kite.ltp([f"NSE:{s}" for s in missing]) or {}
+            fresh = {
+                key.split(":", 1)[1]: info["instrument_token"]
+                for key, info in resp.items()
+                if "instrument_token" in info
+            }
+            _TOKENS.update(fresh)
+            try:
+                os.makedirs(os.path.dirname(INSTRUMENT_TOKEN_DB) or ".", exist_ok=True)
+                with shelve.open(INSTRUMENT_TOKEN_DB) as db:
+                    if db.get(_TOKENS_DAY_KEY) != day:
+                        # Earlier day's tokens are never trusted again
+                        db.clear()
+                        db[_TOKENS_DAY_KEY] = day
+                    db.update(fresh)
+            except Exception as e:
+                logger.warning("Could not persist instrument tokens: %s", e)
+
+        return {s: _TOKENS[s] for s in symbols if s in _TOKENS}
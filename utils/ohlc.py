@@ -5,6 +5,8 @@ from typing import Literal
 
 import pandas as pd
 
+from .instrument_cache import ltp_instrument_tokens
+from .rate_limit import HIST_LIMITER
 from .token_store import get_kite
 
 
@@ -18,16 +20,18 @@ def fetch_ohlc(
     """
     kite = get_kite(validate=False)
 
-    # Resolve instrument token via LTP lookup
-    inst = kite.ltp([f"NSE:{symbol}"])
-    if not inst:
+    # Resolve instrument token (cached; LTP lookup only on first sight)
+    instrument_token = ltp_instrument_tokens(kite, [symbol]).get(symbol)
+    if instrument_token is None:
         return pd.DataFrame()
 
-    instrument_token = list(inst.values())[0]["instrument_token"]
-
     to_dt = datetime.now()
     from_dt = to_dt - timedelta(days=days)
+    if interval == "day":
+        # Daily candles only need the calendar range
+        from_dt, to_dt = from_dt.date(), to_dt.date()
 
+    HIST_LIMITER.wait()
     hist = kite.historical_data(
         instrument_token=instrument_token,
         from_date=from_dt,
@@ -0,0 +1,36 @@
+# utils/rate_limit.py
+"""
+Process-wide pacing for Kite's historical API, shared by every module that
+calls kite.historical_data (fetch_ohlc, utils.ohlc, utils.zerodha).
+"""
+import os
+import time
+import threading
+
+# Kite historical API allows ~3 requests/second per app; shared by all fetch threads
+KITE_HIST_MAX_QPS = float(os.getenv("KITE_HIST_MAX_QPS", "3"))
+
+
+class RateLimiter:
+    """
+    Thread-safe pacing: hands out call slots spaced 1/qps apart, so concurrent
+    callers never exceed `qps` in aggregate. qps <= 0 disables pacing.
+    """
+
+    def __init__(self, qps: float):
+        self._interval = 1.0 / qps if qps > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self._interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+HIST_LIMITER = RateLimiter(KITE_HIST_MAX_QPS)
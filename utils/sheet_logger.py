@@ -10,7 +10,7 @@ try:
 except ImportError:
     st = None
 
-from .google_client import get_gspread_client
+from .google_client import get_gspread_client, replace_values_requests
 
 
 def log_to_google_sheets(
@@ -42,11 +42,12 @@ def log_to_google_sheets(
         client = get_gspread_client()
         sheet = client.open(workbook).worksheet(sheet_name)
 
-        if clear:
-            sheet.clear()
-
         data = [df.columns.tolist()] + df.values.tolist()
-        sheet.update("A1", data)
+        if clear:
+            # clear + write in one round-trip
+            sheet.spreadsheet.batch_update({"requests": replace_values_requests(sheet, data)})
+        else:
+            sheet.update("A1", data)
     except Exception as e:
         msg = f"⚠️ Could not update Google Sheet: {e}"
         logging.warning(msg)
@@ -2,20 +2,49 @@
 
 from __future__ import annotations
 
+import os
+import time
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Tuple
 
 from kiteconnect import KiteConnect
+from urllib3.util.retry import Retry
 
 from .google_client import get_gspread_client
 
 
 IST = timezone(timedelta(hours=5, minutes=30))
 
+# HTTPAdapter settings for every KiteConnect session (KiteConnect(pool=KITE_POOL)):
+# pooled TLS connections reused across symbol fetches and sized for the fetch
+# threads, with retry/backoff on throttling + 5xx. raise_on_status=False hands
+# the last response back to kiteconnect once retries run out, so callers still
+# get its typed exceptions (TokenException, NetworkException, ...) and messages
+# instead of a bare RetryError.
+KITE_POOL = {
+    "pool_connections": 20,
+    "pool_maxsize": 20,
+    "max_retries": Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        raise_on_status=False,
+    ),
+}
+
 SHEET_NAME = "ZerodhaTokenStore"
 WORKSHEET = "Sheet1"
 
+# read_token_row is served from memory for this long (seconds); writes invalidate it
+TOKEN_ROW_TTL = float(os.getenv("TOKEN_ROW_TTL", "60"))
+_token_row_cache: Optional[Tuple[float, "TokenRow"]] = None
+
+# get_kite(validate=True) re-pings kite.profile() at most this often per token (seconds)
+PROFILE_CHECK_TTL = float(os.getenv("PROFILE_CHECK_TTL", "300"))
+_last_validated: Optional[Tuple[str, float]] = None
+
 
 @dataclass
 class TokenRow:
@@ -26,14 +55,37 @@ class TokenRow:
     updated_at: Optional[datetime]
 
 
+@lru_cache(maxsize=4)
+def _kite_client(api_key: str, access_token: str) -> KiteConnect:
+    kite = KiteConnect(api_key=api_key, pool=KITE_POOL)
+    kite.set_access_token(access_token)
+    return kite
+
+
+@lru_cache(maxsize=1)
 def _get_token_sheet():
     client = get_gspread_client()
+    # By key when configured: open(name) costs an extra Drive files.list lookup
+    sheet_key = os.getenv("ZERODHA_TOKEN_SHEET_KEY", "")
+    if sheet_key:
+        return client.open_by_key(sheet_key).worksheet(os.getenv("ZERODHA_TOKEN_WORKSHEET", WORKSHEET))
     return client.open(SHEET_NAME).worksheet(WORKSHEET)
 
 
+def invalidate_token_row() -> None:
+    """Forget the memoized token row; call after writing the token sheet elsewhere."""
+    global _token_row_cache
+    _token_row_cache = None
+
+
 def read_token_row() -> TokenRow:
-    ws = _get_token_sheet()
-    row = ws.row_values(1) + ["", "", "", "", ""]
+    global _token_row_cache
+    if _token_row_cache is not None and time.monotonic() - _token_row_cache[0] < TOKEN_ROW_TTL:
+        return _token_row_cache[1]
+
+    # One bounded read of A1:E1 (key, secret, token, expires_at, updated_at)
+    values = _get_token_sheet().get("A1:E1")
+    row = (values[0] if values else []) + ["", "", "", "", ""]
     api_key = (row[0] or "").strip()
     api_secret = (row[1] or "").strip()
     access_token = (row[2] or "").strip()
@@ -54,37 +106,53 @@ def read_token_row() -> TokenRow:
     if not api_key or not api_secret:
         raise RuntimeError("ZerodhaTokenStore missing API key/secret in A1/B1")
 
-    return TokenRow(
+    tr = TokenRow(
         api_key=api_key,
         api_secret=api_secret,
         access_token=access_token,
         expires_at=expires_at,
         updated_at=updated_at,
     )
+    _token_row_cache = (time.monotonic(), tr)
+    return tr
 
 
 def write_access_token(access_token: str, ttl_hours: int = 24) -> None:
     ws = _get_token_sheet()
     now = datetime.now(IST)
     expires_at = now + timedelta(hours=ttl_hours - 0.25)
-    ws.update("C1", [[access_token]])
-    ws.update("D1", [[expires_at.isoformat()]])
-    ws.update("E1", [[now.isoformat()]])
+    # C1:E1 in one write (token, expiry, updated-at)
+    ws.update("C1:E1", [[access_token, expires_at.isoformat(), now.isoformat()]])
+    invalidate_token_row()
 
 
 def get_kite(validate: bool = True) -> KiteConnect:
     """
     Returns a KiteConnect instance using the stored API key + access token.
 
-    If validate=True, calls kite.profile() once to ensure token is still valid.
+    If validate=True, calls kite.profile() to ensure the token is still valid. A token
+    that passed within PROFILE_CHECK_TTL seconds and is not past its D1 expiry is
+    trusted without another round-trip.
     """
+    global _last_validated
     tr = read_token_row()
-    kite = KiteConnect(api_key=tr.api_key)
     if not tr.access_token:
         raise RuntimeError("ZerodhaTokenStore C1 is empty (no access_token).")
-    kite.set_access_token(tr.access_token)
+    kite = _kite_client(tr.api_key, tr.access_token)
 
     if validate:
-        # simple ping
-        kite.profile()
+        now = time.monotonic()
+        expires_at = tr.expires_at
+        if expires_at is not None and expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=IST)
+        expired = expires_at is not None and datetime.now(IST) >= expires_at
+        recent = (
+            _last_validated is not None
+            and _last_validated[0] == tr.access_token
+            and now - _last_validated[1] < PROFILE_CHECK_TTL
+        )
+        if expired or not recent:
+            # simple ping
+            kite.profile()
+            _last_validated = (tr.access_token, now)
     return kite
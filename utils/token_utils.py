@@ -1,49 +1,24 @@
 import os
-import json
-import base64
-import gspread
+from functools import lru_cache
 import streamlit as st
-from google.oauth2.service_account import Credentials
 
-SCOPE = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive",
-]
+from .google_client import get_gspread_client
+from .token_store import invalidate_token_row
 
-def _get_sa_raw() -> str:
-    # Prefer env (GitHub Actions), else Streamlit secrets (Streamlit Cloud)
-    return (os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON") or st.secrets.get("GOOGLE_SERVICE_ACCOUNT_JSON", "") or "").strip()
+# Same process-wide authorized client as the rest of the app (one OAuth handshake)
+_client = get_gspread_client
 
-def _parse_service_account(raw: str) -> dict:
-    """
-    Accepts either:
-      - plain JSON string
-      - base64-encoded JSON string
-    Returns dict usable by Credentials.from_service_account_info
-    """
-    if not raw:
-        raise RuntimeError("Missing GOOGLE_SERVICE_ACCOUNT_JSON in secrets/env.")
-
-    # Try plain JSON first
-    try:
-        return json.loads(raw)
-    except json.JSONDecodeError:
-        pass
+@lru_cache(maxsize=4)
+def _worksheet(sheet_key: str, ws_name: str):
+    # open_by_key + worksheet lookup are metadata round-trips; do them once per sheet
+    return _client().open_by_key(sheet_key).worksheet(ws_name)
 
-    # Try base64 decode -> JSON
-    try:
-        decoded = base64.b64decode(raw).decode("utf-8").strip()
-        return json.loads(decoded)
-    except Exception as e:
-        raise RuntimeError(
-            "GOOGLE_SERVICE_ACCOUNT_JSON is neither valid JSON nor base64-encoded JSON."
-        ) from e
-
-def _client():
-    sa_raw = _get_sa_raw()
-    info = _parse_service_account(sa_raw)
-    creds = Credentials.from_service_account_info(info, scopes=SCOPE)
-    return gspread.authorize(creds)
+def _token_worksheet():
+    sheet_key = os.getenv("ZERODHA_TOKEN_SHEET_KEY") or st.secrets.get("ZERODHA_TOKEN_SHEET_KEY", "")
+    ws_name = os.getenv("ZERODHA_TOKEN_WORKSHEET") or st.secrets.get("ZERODHA_TOKEN_WORKSHEET", "Sheet1")
+    if not sheet_key:
+        raise RuntimeError("Missing ZERODHA_TOKEN_SHEET_KEY in secrets/env.")
+    return _worksheet(sheet_key, ws_name)
 
 def load_credentials_from_gsheet():
     """
@@ -53,26 +28,18 @@ def load_credentials_from_gsheet():
       C1 = access_token
     from ZerodhaTokenStore sheet KEY (not by name).
     """
-    sheet_key = os.getenv("ZERODHA_TOKEN_SHEET_KEY") or st.secrets.get("ZERODHA_TOKEN_SHEET_KEY", "")
-    ws_name = os.getenv("ZERODHA_TOKEN_WORKSHEET") or st.secrets.get("ZERODHA_TOKEN_WORKSHEET", "Sheet1")
-    if not sheet_key:
-        raise RuntimeError("Missing ZERODHA_TOKEN_SHEET_KEY in secrets/env.")
+    ws = _token_worksheet()
 
-    gc = _client()
-    ws = gc.open_by_key(sheet_key).worksheet(ws_name)
-
-    api_key = (ws.acell("A1").value or "").strip()
-    api_secret = (ws.acell("B1").value or "").strip()
-    access_token = (ws.acell("C1").value or "").strip()
+    # A1:C1 in one read instead of three acell round-trips
+    values = ws.get("A1:C1")
+    row = (values[0] if values else []) + ["", "", ""]
+    api_key, api_secret, access_token = (str(v or "").strip() for v in row[:3])
 
     return api_key, api_secret, access_token
 
 def save_token_to_gsheet(token: str):
-    sheet_key = os.getenv("ZERODHA_TOKEN_SHEET_KEY") or st.secrets.get("ZERODHA_TOKEN_SHEET_KEY", "")
-    ws_name = os.getenv("ZERODHA_TOKEN_WORKSHEET") or st.secrets.get("ZERODHA_TOKEN_WORKSHEET", "Sheet1")
-    if not sheet_key:
-        raise RuntimeError("Missing ZERODHA_TOKEN_SHEET_KEY in secrets/env.")
-
-    gc = _client()
-    ws = gc.open_by_key(sheet_key).worksheet(ws_name)
-    ws.update_acell("C1", token)
+    ws = _token_worksheet()
+    # values.batchUpdate, RAW so the token is stored verbatim (never parsed as a number/formula)
+    ws.batch_update([{"range": "C1", "values": [[token]]}], value_input_option="RAW")
+    # token_store.get_kite() memoizes the row; make it pick up the new token now
+    invalidate_token_row()
@@ -3,26 +3,36 @@ import os
 import pandas as pd
 import gspread
 import logging
+from functools import lru_cache
 from kiteconnect import KiteConnect
-from oauth2client.service_account import ServiceAccountCredentials
-from datetime import datetime
+from google.oauth2.service_account import Credentials
+from datetime import datetime, timedelta
 import streamlit as st
 
+from .instrument_cache import ltp_instrument_tokens
+from .rate_limit import HIST_LIMITER
+from .token_store import KITE_POOL
+
+@lru_cache(maxsize=4)
 def get_kite(api_key, access_token):
-    kite = KiteConnect(api_key=api_key)
+    # One client (and keep-alive session) per token, reused across calls
+    kite = KiteConnect(api_key=api_key, pool=KITE_POOL)
     kite.set_access_token(access_token)
     return kite
 
 def get_stock_data(kite, symbol, interval, days):
     try:
-        instrument = kite.ltp(f"NSE:{symbol}")
-        if not instrument:
+        instrument_token = ltp_instrument_tokens(kite, [symbol]).get(symbol)
+        if instrument_token is None:
             return pd.DataFrame()
-        instrument_token = list(instrument.values())[0]['instrument_token']
 
-        from_date = datetime.now() - pd.Timedelta(days=days)
         to_date = datetime.now()
+        from_date = to_date - timedelta(days=days)
+        if interval == "day":
+            # Daily candles only need the calendar range
+            from_date, to_date = from_date.date(), to_date.date()
 
+        HIST_LIMITER.wait()
         historical_data = kite.historical_data(
             instrument_token=instrument_token,
             from_date=from_date,
@@ -34,15 +44,22 @@ def get_stock_data(kite, symbol, interval, days):
         logging.warning(f"❌ Failed to fetch data for {symbol}: {e}")
         return pd.DataFrame()
 
+@lru_cache(maxsize=1)
+def _ltp_gspread_client():
+    # google-auth credentials (requests transport), authorized once per process
+    scope = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+    creds_dict = json.loads(st.secrets["gspread_service_account"])
+    creds = Credentials.from_service_account_info(creds_dict, scopes=scope)
+    return gspread.authorize(creds)
+
 def update_ltp_sheet():
     # Load credentials from secrets
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds_dict = json.loads(st.secrets["gspread_service_account"])
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-    client = gspread.authorize(creds)
+    client = _ltp_gspread_client()
 
     # Read Zerodha token details from sheet
-    token_sheet = client.open("ZerodhaTokenStore").sheet1
+    # By key when configured: open(name) costs an extra Drive files.list lookup
+    token_key = os.getenv("ZERODHA_TOKEN_SHEET_KEY", "")
+    token_sheet = (client.open_by_key(token_key) if token_key else client.open("ZerodhaTokenStore")).sheet1
     tokens = token_sheet.get_all_values()[0]
     api_key, api_secret, access_token = tokens[0], tokens[1], tokens[2]
 
@@ -50,21 +67,20 @@ def update_ltp_sheet():
     kite = get_kite(api_key, access_token)
 
     # Read list of symbols from LiveLTPStore
-    sheet = client.open("LiveLTPStore").sheet1
+    ltp_key = os.getenv("LIVE_LTP_SHEET_KEY", "")
+    sheet = (client.open_by_key(ltp_key) if ltp_key else client.open("LiveLTPStore")).sheet1
     symbols = [row[0] for row in sheet.get_all_values()[1:] if row]
 
     # Get live prices
     instruments = [f"NSE:{symbol}" for symbol in symbols]
     try:
         live_data = kite.ltp(instruments)
-        rows = []
-        for symbol in symbols:
-            key = f"NSE:{symbol}"
-            if key in live_data:
-                ltp = live_data[key]['last_price']
-                rows.append([symbol, ltp])
-        # Update headers and data
-        sheet.update(values=[["Symbol", "LTP"]], range_name="A1:B1")
-        sheet.update(values=rows, range_name="A2")
+        rows = [
+            [symbol, live_data[key]['last_price']]
+            for symbol, key in zip(symbols, instruments)
+            if key in live_data
+        ]
+        # Headers and data in one write
+        sheet.update(values=[["Symbol", "LTP"]] + rows, range_name="A1")
     except Exception as e:
         logging.error(f"⚠️ Error updating LTPs: {e}")